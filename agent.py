@@ -7,10 +7,21 @@ smart contract in Yul with the chat history as metadata.
 """
 
 import asyncio
+import functools
+import hashlib
 import json
 import os
-from datetime import datetime
-from typing import Annotated
+import re
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import MappingProxyType
+from typing import Annotated, Literal, Mapping, NamedTuple
 from pydantic import Field
 from dotenv import load_dotenv
 
@@ -18,41 +29,170 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from agent_framework import ChatAgent
-from agent_framework.openai import OpenAIChatClient
-try:
-    from agent_framework.azure import AzureOpenAIChatClient
-except ImportError:
-    AzureOpenAIChatClient = None
+# Provider chat clients are imported in _get_openai_chat_client, _get_anthropic_chat_client and
+# _get_azure_chat_client, so importing this module stays light
+
+# Prefer orjson for metadata (de)serialization, fall back to the stdlib json module
 try:
-    from agent_framework.anthropic import AnthropicChatClient
+    import orjson
+
+    def _dumpb(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _dumpb_compact(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
 except ImportError:
-    AnthropicChatClient = None
+    def _dumpb(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode("utf-8")
+
+    def _dumpb_compact(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _loads = json.loads
+
+# Maximum number of messages kept in the chat history; older messages are dropped first
+_CHAT_HISTORY_MAX = int(os.environ.get("CHAT_HISTORY_MAX", "10000"))
+if _CHAT_HISTORY_MAX < 1:
+    raise ValueError(f"CHAT_HISTORY_MAX must be at least 1, got {_CHAT_HISTORY_MAX}")
+
+# Message content budget (in characters) for minted metadata; older messages beyond it are summarized
+_CHAT_HISTORY_MAX_CHARS = int(os.environ.get("CHAT_HISTORY_MAX_CHARS", "100000"))
+
+# Limits for the heuristic summary of older messages
+_SUMMARY_EXCERPT_CHARS = 80
+_SUMMARY_MAX_CHARS = 2000
+
+# Histories longer than this are streamed to the metadata file instead of encoded in one shot
+_STREAM_METADATA_MIN_MESSAGES = 1000
+
+# Write buffer for streamed metadata files, so per-message writes are batched into few syscalls
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+class ChatMessage(NamedTuple):
+    """A single chat history entry."""
+    role: str
+    content: str
+    timestamp: str
+
+
+class SummaryState(NamedTuple):
+    """Running summary of the oldest messages in the chat history."""
+    messages: int = 0
+    user: int = 0
+    assistant: int = 0
+    chars: int = 0
+    excerpts: tuple[str, ...] = ()
+    budget: int = _SUMMARY_MAX_CHARS
+    last: dict | None = None
+
+
+# Running summary, extended incrementally across pulses; replaced as a whole so concurrent pulses and clears never see a partial update
+_summary_state: SummaryState | None = None
+
 
 # Chat history storage
-_chat_history = []
+_chat_history: deque[ChatMessage] = deque(maxlen=_CHAT_HISTORY_MAX)
+
+# Messages per role currently in _chat_history, kept up to date as messages are added and evicted
+_role_counts: dict[str, int] = {}
+
+# Bumped on every chat history change, so a pulse can tell whether the history is unchanged
+_history_version = 0
+
+# Serializes history changes against pulse snapshots, which run on other threads in the UI
+_history_lock = threading.Lock()
+
+# Number of pulse_button calls, so callers can tell whether a reply ran the tool
+_pulse_calls = 0
+
+# Time of the most recent pulse; each pulse takes a later one, so concurrent pulses never share filenames
+_last_pulse_time: datetime | None = None
+_pulse_time_lock = threading.Lock()
+
+# (key, output files, reuse message) of the last successful pulse, replaced as a whole so readers never see a mix
+_last_pulse: tuple | None = None
+
+# Default core if file doesn't exist (read-only, since it is shared by every caller)
+_DEFAULT_CORE: Mapping = MappingProxyType({
+    "name": "Agent Template",
+    "description": "A customizable AI agent template",
+    "version": "1.0.0",
+    "owner": ""  # User must set this
+})
+
+
+@functools.lru_cache(maxsize=8)
+def _load_core_json_cached(core_file_path: str, signature: tuple[int, int, int]) -> Mapping:
+    """Parse a core JSON file; cached per (path, file signature) as a read-only mapping."""
+    return MappingProxyType(_loads(Path(core_file_path).read_bytes()))
+
+
+def _core_file_signature(core_file_path: str) -> tuple[int, int, int] | None:
+    """
+    Return what identifies a version of the core file, or None if it doesn't exist.
+    
+    The modification time alone can repeat within a coarse timestamp tick, but
+    save_core_json swaps in a new inode, so the inode and size tell such saves apart.
+    """
+    try:
+        st = os.stat(core_file_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_ino, st.st_size
+
+
+def _read_core_json(core_file_path: str) -> Mapping:
+    """Return the cached, read-only core JSON for a path without copying it."""
+    signature = _core_file_signature(core_file_path)
+    if signature is None:
+        return _DEFAULT_CORE
+    return _load_core_json_cached(core_file_path, signature)
+
 
 # Load agent core JSON specification
 def load_core_json(core_file_path: str = "core.json") -> dict:
     """
     Load the agent core JSON specification from a file.
     
+    The parsed file is cached until it changes on disk.
+    
     Args:
         core_file_path: Path to the JSON file containing agent core specification
         
     Returns:
         Dictionary containing the agent core specification
     """
-    if os.path.exists(core_file_path):
-        with open(core_file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    else:
-        # Default core if file doesn't exist
-        return {
-            "name": "Agent Template",
-            "description": "A customizable AI agent template",
-            "version": "1.0.0",
-            "owner": ""  # User must set this
-        }
+    # Return a copy so callers can modify it without touching the cache
+    return dict(_read_core_json(core_file_path))
+
+
+def save_core_json(core_json: dict, core_file_path: str = "core.json"):
+    """
+    Save the agent core JSON specification to a file.
+    
+    Args:
+        core_json: Dictionary containing the agent core specification
+        core_file_path: Path to the JSON file to write
+    """
+    # Write a uniquely named sibling temp file and swap it in, so readers never see a half-written file
+    # and concurrent saves never share a temp file
+    path = Path(core_file_path)
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_dumpb(core_json))
+        # mkstemp creates the file owner-only; keep the permissions the core file had
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
 
 
 def get_owner_address(core_file_path: str = "core.json") -> str:
@@ -70,44 +210,93 @@ def get_owner_address(core_file_path: str = "core.json") -> str:
     if owner:
         return owner
     
-    # Then check core.json
-    core_json = load_core_json(core_file_path)
-    owner = core_json.get("owner", "")
+    # Then check core.json (read-only, so the cached dict needs no copy)
+    owner = _read_core_json(core_file_path).get("owner", "")
     
     return owner
 
 
 def add_to_chat_history(role: str, content: str):
     """Add a message to the chat history."""
-    _chat_history.append({
-        "role": role,
-        "content": content,
-        "timestamp": datetime.now().isoformat()
-    })
+    global _history_version
+    # Intern the role so role lookups and _split_history's identity checks hit for roles built at runtime
+    role = sys.intern(role)
+    message = ChatMessage(role, content, datetime.now().isoformat())
+    with _history_lock:
+        # A full deque drops its oldest message on append
+        if len(_chat_history) == _chat_history.maxlen:
+            _role_counts[_chat_history[0].role] -= 1
+        _chat_history.append(message)
+        _role_counts[role] = _role_counts.get(role, 0) + 1
+        # Bump only after the change, so a pulse never records the new version with the old history
+        _history_version += 1
 
 
 def get_chat_history() -> list:
-    """Get the full chat history."""
-    return _chat_history.copy()
+    """Get the full chat history as a list of message dictionaries."""
+    # tuple() copies the deque in one C call, so appends from other threads can't interrupt the iteration
+    return [
+        {"role": role, "content": content, "timestamp": timestamp}
+        for role, content, timestamp in tuple(_chat_history)
+    ]
+
+
+def _snapshot_chat_history() -> tuple[int, list]:
+    """Return the history version together with a copy of the history it describes."""
+    with _history_lock:
+        return _history_version, get_chat_history()
+
+
+def get_chat_history_columns() -> tuple[tuple[str, ...], tuple[str, ...], tuple[str, ...]]:
+    """
+    Get the chat history as parallel columns without building per-message dictionaries.
+    
+    Returns:
+        Tuple of (roles, contents, timestamps) tuples
+    """
+    if not _chat_history:
+        return (), (), ()
+    return tuple(zip(*_chat_history))
+
+
+def get_pulse_call_count() -> int:
+    """Get how many times pulse_button has been called in this process (including reused pulses)."""
+    return _pulse_calls
+
+
+def get_chat_history_counts() -> dict[str, int]:
+    """
+    Get the number of messages per role without scanning the chat history.
+    
+    Returns:
+        Dictionary with "user" and "assistant" counts, plus any other roles present
+    """
+    return {"user": 0, "assistant": 0, **_role_counts}
 
 
 def clear_chat_history():
-    """Clear the chat history."""
-    global _chat_history
-    _chat_history = []
+    """Clear the chat history in place."""
+    global _history_version, _summary_state
+    with _history_lock:
+        _chat_history.clear()
+        _role_counts.clear()
+        _summary_state = None
+        _history_version += 1
 
 
-def generate_erc721_yul_contract(chat_history: list, user_request: str = "", owner_address: str = "") -> str:
+# Owner address: optional 0x prefix followed by exactly 40 hex characters
+_ADDR_RE = re.compile(r"(?:0x)?([0-9a-fA-F]{40})")
+
+
+def _resolve_owner_address(owner_address: str = "") -> str:
     """
-    Generates a payable ERC721 smart contract in Yul with chat history as metadata.
+    Resolve and validate the contract owner address.
     
     Args:
-        chat_history: List of chat messages
-        user_request: Optional user request/description
-        owner_address: Owner address for the contract (if empty, uses config)
+        owner_address: Owner address (if empty, uses config)
         
     Returns:
-        Yul contract code as string
+        Owner address with a "0x" prefix
     """
     # Get owner address from parameter or config
     if not owner_address:
@@ -116,46 +305,190 @@ def generate_erc721_yul_contract(chat_history: list, user_request: str = "", own
     if not owner_address:
         raise ValueError("Owner address not set. Please set it in core.json or ERC721_OWNER_ADDRESS environment variable.")
     
-    # Validate address format
+    # Validate address format in a single match; the checks below only pick the error message
+    match = _ADDR_RE.fullmatch(owner_address)
+    if match is not None:
+        return "0x" + match.group(1)
+    
     if not owner_address.startswith("0x"):
         owner_address = "0x" + owner_address
     
     if len(owner_address) != 42:  # 0x + 40 hex chars
         raise ValueError(f"Invalid owner address format: {owner_address}. Must be 42 characters (0x + 40 hex chars).")
     
-    # Separate user messages and AI responses
-    user_messages = [msg for msg in chat_history if msg.get("role") == "user"]
-    ai_responses = [msg for msg in chat_history if msg.get("role") == "assistant"]
+    raise ValueError(f"Invalid owner address format: {owner_address}. Must contain only hex characters after 0x.")
+
+
+def _split_history(chat_history: list) -> tuple[list, list]:
+    """Separate user messages and AI responses in a single pass over the chat history."""
+    user_messages = []
+    ai_responses = []
+    add_user = user_messages.append
+    add_ai = ai_responses.append
+    user, assistant = "user", "assistant"
+    # Every entry carries a role; roles are interned literals, so identity usually matches
+    for msg in chat_history:
+        role = msg["role"]
+        if role is user or role == user:
+            add_user(msg)
+        elif role is assistant or role == assistant:
+            add_ai(msg)
+    return user_messages, ai_responses
+
+
+def _fold_into_summary(state: SummaryState, messages: list) -> SummaryState:
+    """Fold messages into a running summary: role counts, character total and user message excerpts."""
+    user = state.user
+    assistant = state.assistant
+    chars = state.chars
+    budget = state.budget
+    excerpts = list(state.excerpts)
+    for msg in messages:
+        content = msg.get("content", "")
+        chars += len(content)
+        role = msg.get("role")
+        if role == "assistant":
+            assistant += 1
+        if role != "user":
+            continue
+        user += 1
+        excerpt = " ".join(content.split())[:_SUMMARY_EXCERPT_CHARS]
+        if excerpt and len(excerpt) + 3 <= budget:
+            excerpts.append(excerpt)
+            budget -= len(excerpt) + 3
+    return SummaryState(
+        messages=state.messages + len(messages),
+        user=user,
+        assistant=assistant,
+        chars=chars,
+        excerpts=tuple(excerpts),
+        budget=budget,
+        last=messages[-1] if messages else state.last
+    )
+
+
+def _render_summary(state: SummaryState) -> str:
+    """Render a running summary as text."""
+    # Messages of any other role (e.g. system or tool) are counted separately
+    other = state.messages - state.user - state.assistant
+    other_note = f", {other} other" if other else ""
+    
+    # Roughly 4 characters per token
+    return (
+        f"Summary of {state.messages} earlier messages ({state.user} from user, "
+        f"{state.assistant} from assistant{other_note}, ~{state.chars // 4} tokens). "
+        f"User topics: {' | '.join(state.excerpts)}"
+    )
+
+
+def _maybe_summarize(chat_history: list, max_chars: int = _CHAT_HISTORY_MAX_CHARS) -> tuple[list, int]:
+    """
+    Replace the oldest messages with a single summary entry when the history is too long.
+    
+    Messages are kept verbatim from the newest backwards until their content exceeds
+    max_chars; everything older is folded into one message with the "summary" role.
+    The newest message is always kept verbatim.
+    
+    The summary is kept between calls, so a later pulse over the same history only
+    folds in the messages that have aged out since the previous one.
+    
+    Args:
+        chat_history: List of chat messages
+        max_chars: Content budget for messages kept verbatim
+        
+    Returns:
+        Tuple of (chat history to mint, number of messages summarized)
+    """
+    total = 0
+    for index in range(len(chat_history) - 1, -1, -1):
+        total += len(chat_history[index].get("content", ""))
+        if total > max_chars:
+            break
+    else:
+        return chat_history, 0
     
-    # Create metadata JSON from chat history
-    metadata = {
+    keep_from = min(index + 1, len(chat_history) - 1)
+    if keep_from == 0:
+        return chat_history, 0
+    
+    global _summary_state
+    older = chat_history[:keep_from]
+    
+    # Extend the previous summary if it covers a prefix of this history, otherwise start over.
+    # The state is read once and stored with one assignment, so a concurrent clear can't be seen half done
+    state = _summary_state
+    if state is None or not (0 < state.messages <= keep_from and older[state.messages - 1] == state.last):
+        state = SummaryState()
+    state = _fold_into_summary(state, older[state.messages:])
+    _summary_state = state
+    
+    summary = {
+        "role": "summary",
+        "content": _render_summary(state),
+        "timestamp": older[-1].get("timestamp", "")
+    }
+    return [summary, *chat_history[keep_from:]], keep_from
+
+
+def build_chat_metadata(
+    chat_history: list,
+    user_request: str = "",
+    owner_address: str = "",
+    mint_timestamp: str | None = None
+) -> dict:
+    """
+    Build the NFT metadata dictionary for a chat history.
+    
+    If the message content exceeds CHAT_HISTORY_MAX_CHARS, the oldest messages are
+    replaced by a single summary entry.
+    
+    Args:
+        chat_history: List of chat messages
+        user_request: Optional user request/description
+        owner_address: Validated owner address
+        mint_timestamp: ISO timestamp of the mint. If None, uses the current time.
+        
+    Returns:
+        Metadata dictionary
+    """
+    total_messages = len(chat_history)
+    chat_history, summarized_messages = _maybe_summarize(chat_history)
+    user_messages, ai_responses = _split_history(chat_history)
+    
+    return {
         "name": "Chat History NFT",
         "description": user_request or "Minted chat history with agent",
         "chat_history": chat_history,
         "user_messages": user_messages,
         "ai_responses": ai_responses,
         "summary": {
-            "total_messages": len(chat_history),
+            "total_messages": total_messages,
+            "summarized_messages": summarized_messages,
             "user_messages_count": len(user_messages),
             "ai_responses_count": len(ai_responses),
             "conversation_pairs": min(len(user_messages), len(ai_responses))
         },
-        "mint_timestamp": datetime.now().isoformat(),
+        "mint_timestamp": mint_timestamp or datetime.now().isoformat(),
         "owner": owner_address
     }
-    
-    metadata_json = json.dumps(metadata, indent=2)
-    
-    # Convert owner address to bytes20 for Yul (addresses are 20 bytes, padded to 32 bytes)
-    owner_address_clean = owner_address[2:] if owner_address.startswith("0x") else owner_address
-    owner_hex = "0x" + owner_address_clean.zfill(64)  # Pad to 64 hex chars (32 bytes)
-    
-    # Generate Yul ERC721 contract
-    # Note: This is a simplified ERC721 implementation in Yul
-    yul_contract = f'''// SPDX-License-Identifier: MIT
+
+
+# Left padding that widens a 20-byte address to a 32-byte word (24 zero hex chars)
+_OWNER_HEX_PAD = "0x" + "0" * 24
+
+
+@functools.lru_cache(maxsize=8)
+def _owner_hex(owner_address: str) -> str:
+    """Convert a validated owner address to a 32-byte Yul word literal (addresses are 20 bytes, left-padded)."""
+    return _OWNER_HEX_PAD + owner_address[2:]
+
+
+# Yul ERC721 contract template (braces are doubled for str.format), followed by one of the metadata trailers below
+# Note: This is a simplified ERC721 implementation in Yul
+_YUL_TEMPLATE = '''// SPDX-License-Identifier: MIT
 // ERC721 Payable Contract in Yul
 // Owner: {owner_address}
-// Generated: {datetime.now().isoformat()}
+// Generated: {generated_at}
 
 object "ERC721ChatHistory" {{
     code {{
@@ -262,13 +595,228 @@ object "ERC721ChatHistory" {{
     }}
 }}
 
-// Metadata JSON (stored separately):
-{metadata_json}'''
+'''
+
+# Trailer pointing at the sidecar metadata file written alongside the contract
+_YUL_METADATA_REF = "// Metadata JSON: see {metadata_filename}\n"
+
+# Trailer identifying the metadata JSON by content hash when there is no sidecar file to name
+_YUL_METADATA_HASH = "// Metadata JSON sha256: {metadata_sha256}\n"
+
+
+# Everything but the Generated timestamp depends only on the owner address
+_YUL_HEAD, _YUL_BODY = _YUL_TEMPLATE.split("{generated_at}")
+
+
+@functools.lru_cache(maxsize=32)
+def _build_yul_body(owner_address: str) -> tuple[str, str]:
+    """Render the Yul contract text before and after the Generated timestamp for a validated owner address."""
+    return (
+        _YUL_HEAD.format(owner_address=owner_address),
+        _YUL_BODY.format(owner_hex=_owner_hex(owner_address))
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _build_yul_body_bytes(owner_address: str) -> tuple[bytes, bytes]:
+    """UTF-8 encoded form of _build_yul_body, so repeated pulses for an owner skip the encode."""
+    head, body = _build_yul_body(owner_address)
+    return head.encode('utf-8'), body.encode('utf-8')
+
+
+def generate_erc721_yul_contract(
+    chat_history: list,
+    user_request: str = "",
+    owner_address: str = "",
+    metadata_json: str | None = None,
+    generated_at: str | None = None,
+    metadata_filename: str | None = None
+) -> str:
+    """
+    Generates a payable ERC721 smart contract in Yul with chat history as metadata.
+    
+    Args:
+        chat_history: List of chat messages
+        user_request: Optional user request/description
+        owner_address: Owner address for the contract (if empty, uses config)
+        metadata_json: Pre-serialized metadata JSON to hash. If None, it is built from chat_history.
+        generated_at: ISO timestamp for the contract header. If None, uses the current time.
+        metadata_filename: Sidecar metadata file. If given, the contract references it
+            instead of carrying the metadata JSON hash.
+        
+    Returns:
+        Yul contract code as string
+    """
+    owner_address = _resolve_owner_address(owner_address)
+    
+    if generated_at is None:
+        generated_at = datetime.now().isoformat()
+    
+    # Generate Yul ERC721 contract
+    yul_contract = _format_yul_template(owner_address, generated_at)
+    
+    if metadata_filename:
+        return yul_contract + _YUL_METADATA_REF.format(metadata_filename=metadata_filename)
+    
+    # Create metadata JSON from chat history unless the caller already serialized it
+    if metadata_json is None:
+        metadata_bytes = _dumpb(build_chat_metadata(chat_history, user_request, owner_address, generated_at))
+    else:
+        metadata_bytes = metadata_json.encode('utf-8')
+    
+    # The metadata lives only in its own file; the contract carries just its hash
+    return yul_contract + _YUL_METADATA_HASH.format(metadata_sha256=hashlib.sha256(metadata_bytes).hexdigest())
+
+
+def _format_yul_template(owner_address: str, generated_at: str) -> str:
+    """Fill the Yul contract template for a validated owner address."""
+    head, body = _build_yul_body(owner_address)
+    return "".join((head, generated_at, body))
+
+
+def _render_yul_contract(owner_address: str, generated_at: str, metadata_filename: str) -> bytes:
+    """Render the Yul contract as UTF-8 bytes, referencing the sidecar metadata file."""
+    # Only the timestamp and trailer are encoded per call; the rest is cached per owner
+    head, body = _build_yul_body_bytes(owner_address)
+    trailer = _YUL_METADATA_REF.format(metadata_filename=metadata_filename)
+    return b"".join((head, generated_at.encode('utf-8'), body, trailer.encode('utf-8')))
+
+
+def _pulse_filenames(now: datetime) -> tuple[str, str]:
+    """Return the (contract, metadata) filenames for a pulse taken at the given time."""
+    stamp = (
+        f"{now.year:04d}{now.month:02d}{now.day:02d}_{now.hour:02d}{now.minute:02d}{now.second:02d}"
+        f"_{now.microsecond:06d}"
+    )  # %Y%m%d_%H%M%S_%f
+    return f"ERC721_ChatHistory_{stamp}.yul", f"metadata_{stamp}.json"
+
+
+def _next_pulse_time() -> datetime:
+    """Return the current time, moved past the previous pulse's time if the clock hasn't advanced."""
+    global _last_pulse_time
+    with _pulse_time_lock:
+        now = datetime.now()
+        if _last_pulse_time is not None and now <= _last_pulse_time:
+            now = _last_pulse_time + timedelta(microseconds=1)
+        _last_pulse_time = now
+        return now
+
+
+def _write_metadata_stream(path: str, metadata: dict):
+    """
+    Write metadata JSON to a file one list element at a time.
+    
+    Each chat message is encoded and written on its own line, so peak memory grows with
+    the largest message rather than with the whole serialized history.
+    """
+    with open(path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+        write = f.write
+        write(b"{")
+        # Each separator is chosen once: the first element gets the bare one, every later element the comma form
+        key_sep = b"\n  "
+        for key, value in metadata.items():
+            write(key_sep)
+            key_sep = b",\n  "
+            write(_dumpb_compact(key) + b": ")
+            if isinstance(value, list):
+                write(b"[")
+                item_sep = b"\n    "
+                for item in value:
+                    write(item_sep)
+                    item_sep = b",\n    "
+                    write(_dumpb_compact(item))
+                write(b"\n  ]" if value else b"]")
+            else:
+                write(_dumpb_compact(value))
+        write(b"\n}")
+
+
+def _write_metadata(path: str, metadata: dict, streaming: bool | None = None):
+    """
+    Write the metadata JSON file.
+    
+    Args:
+        path: Output file path
+        metadata: Metadata dictionary
+        streaming: Stream the file message by message. If None, streams only histories
+            longer than _STREAM_METADATA_MIN_MESSAGES and encodes smaller ones in one shot.
+    """
+    if streaming is None:
+        streaming = len(metadata["chat_history"]) > _STREAM_METADATA_MIN_MESSAGES
+    if streaming:
+        _write_metadata_stream(path, metadata)
+    else:
+        Path(path).write_bytes(_dumpb(metadata))
+
+
+def build_pulse_payload(
+    user_request: str = "",
+    owner_address: str = "",
+    chat_history: list | None = None,
+    now: datetime | None = None,
+    serialize_metadata: bool = True,
+    metadata_filename: str | None = None
+) -> tuple[bytes, bytes | None, dict]:
+    """
+    Build the pulse contract and metadata without writing any files.
     
-    return yul_contract
+    Args:
+        user_request: Optional user request or description
+        owner_address: Optional owner address (if not provided, uses config)
+        chat_history: Chat messages to mint. If None, uses the current chat history.
+        now: Pulse time. If None, uses the current time.
+        serialize_metadata: Whether to encode the metadata JSON. If False, metadata_json is None.
+        metadata_filename: Metadata file referenced by the contract. If None, derived from now.
+        
+    Returns:
+        Tuple of (contract, metadata_json, metadata); contract and metadata_json are UTF-8 bytes
+    """
+    owner_address = _resolve_owner_address(owner_address)
+    
+    if chat_history is None:
+        chat_history = get_chat_history()
+    if now is None:
+        now = datetime.now()
+    now_iso = now.isoformat()
+    if metadata_filename is None:
+        _, metadata_filename = _pulse_filenames(now)
+    
+    # Build and serialize the metadata once; only the sidecar file carries it
+    metadata = build_chat_metadata(chat_history, user_request, owner_address, now_iso)
+    metadata_json = _dumpb(metadata) if serialize_metadata else None
+    
+    # Generate the Yul contract as bytes, referencing the metadata file instead of embedding it
+    contract = _render_yul_contract(owner_address, now_iso, metadata_filename)
+    
+    return contract, metadata_json, metadata
+
+
+# Result message of a successful pulse, filled with the output files and metadata summary counts
+_PULSE_RESULT_TEMPLATE = """✅ Pulse button activated! ERC721 contract generated successfully.
+
+📄 Contract saved to: {contract_filename}
+📋 Metadata saved to: {metadata_filename}
+
+🔐 Owner address: {owner}
+💬 Chat messages in metadata: {total_messages}{summarized_note}
+   - User messages: {user_messages_count}
+   - AI responses: {ai_responses_count}
+📝 Contract includes:
+   - Payable mint() function
+   - tokenURI() function returning chat history metadata
+   - owner() function
+   - Reference to the metadata file holding the chat history with user messages and AI responses
+
+You can now deploy this contract and mint your chat history as an NFT!"""
 
+# Appended to the message total when older messages were summarized, since the role counts cover only the rest
+_PULSE_SUMMARIZED_NOTE = " ({summarized} oldest summarized, {verbatim} kept verbatim)"
 
-def pulse_button(user_request: Annotated[str, Field(description="User's request or description for the NFT")] = "", owner_address: str = "") -> str:
+# Prepended to the last result when a pulse reuses its files
+_PULSE_REUSED_PREFIX = "♻️ Chat history unchanged since the last pulse, reusing its contract.\n\n"
+
+
+async def pulse_button(user_request: Annotated[str, Field(description="User's request or description for the NFT")] = "", owner_address: str = "") -> str:
     """
     Pulse button function - generates ERC721 Yul contract with chat history as metadata.
     This function is called when the user presses the pulse button.
@@ -280,10 +828,11 @@ def pulse_button(user_request: Annotated[str, Field(description="User's request
     Returns:
         Confirmation message with contract generation status
     """
+    global _pulse_calls
+    _pulse_calls += 1
+    
     try:
-        chat_history = get_chat_history()
-        
-        if not chat_history:
+        if not _chat_history:
             return "⚠️ No chat history found. Please chat with the agent first before pressing the pulse button."
         
         # Get owner address
@@ -293,58 +842,50 @@ def pulse_button(user_request: Annotated[str, Field(description="User's request
         if not owner_address:
             return "⚠️ Owner address not set. Please set it in core.json or ERC721_OWNER_ADDRESS environment variable before generating contracts."
         
-        # Generate the Yul contract
-        contract = generate_erc721_yul_contract(chat_history, user_request, owner_address)
+        # Reuse the last pulse's files if nothing it was built from has changed and they are still on disk
+        global _last_pulse
+        pulse_key = (_history_version, user_request, owner_address)
+        last_pulse = _last_pulse
+        if last_pulse is not None and last_pulse[0] == pulse_key and all(map(os.path.exists, last_pulse[1])):
+            return last_pulse[2]
         
-        # Save contract to file
-        contract_filename = f"ERC721_ChatHistory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.yul"
-        with open(contract_filename, 'w', encoding='utf-8') as f:
-            f.write(contract)
+        # Key the pulse by the version the snapshot was taken at, which may be newer than the one checked above
+        history_version, chat_history = _snapshot_chat_history()
+        pulse_key = (history_version, user_request, owner_address)
         
-        # Separate user messages and AI responses
-        user_messages = [msg for msg in chat_history if msg.get("role") == "user"]
-        ai_responses = [msg for msg in chat_history if msg.get("role") == "assistant"]
+        # Take a single timestamp for the contract header, metadata and filenames, unique to this pulse
+        now = _next_pulse_time()
+        contract_filename, metadata_filename = _pulse_filenames(now)
         
-        # Save metadata separately
-        metadata = {
-            "name": "Chat History NFT",
-            "description": user_request or "Minted chat history with agent",
-            "chat_history": chat_history,
-            "user_messages": user_messages,
-            "ai_responses": ai_responses,
-            "summary": {
-                "total_messages": len(chat_history),
-                "user_messages_count": len(user_messages),
-                "ai_responses_count": len(ai_responses),
-                "conversation_pairs": min(len(user_messages), len(ai_responses))
-            },
-            "mint_timestamp": datetime.now().isoformat(),
-            "owner": owner_address
-        }
-        metadata_filename = f"metadata_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(metadata_filename, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2)
+        # The metadata is encoded while writing its file below, streamed for long histories
+        contract, _, metadata = build_pulse_payload(
+            user_request, owner_address, chat_history, now,
+            serialize_metadata=False, metadata_filename=metadata_filename
+        )
         
-        # Count messages
-        user_messages = [msg for msg in chat_history if msg.get("role") == "user"]
-        ai_responses = [msg for msg in chat_history if msg.get("role") == "assistant"]
+        # Save contract and metadata to files off the event loop so other tool calls and streaming can proceed
+        await asyncio.gather(
+            asyncio.to_thread(Path(contract_filename).write_bytes, contract),
+            asyncio.to_thread(_write_metadata, metadata_filename, metadata)
+        )
         
-        return f"""✅ Pulse button activated! ERC721 contract generated successfully.
-
-📄 Contract saved to: {contract_filename}
-📋 Metadata saved to: {metadata_filename}
-
-🔐 Owner address: {owner_address}
-💬 Chat messages in metadata: {len(chat_history)}
-   - User messages: {len(user_messages)}
-   - AI responses: {len(ai_responses)}
-📝 Contract includes:
-   - Payable mint() function
-   - tokenURI() function returning chat history metadata
-   - owner() function
-   - Complete chat history with user messages and AI responses stored as JSON metadata
-
-You can now deploy this contract and mint your chat history as an NFT!"""
+        summary = metadata["summary"]
+        summarized = summary["summarized_messages"]
+        summarized_note = _PULSE_SUMMARIZED_NOTE.format(
+            summarized=summarized,
+            verbatim=summary["total_messages"] - summarized
+        ) if summarized else ""
+        message = _PULSE_RESULT_TEMPLATE.format(
+            contract_filename=contract_filename,
+            metadata_filename=metadata_filename,
+            owner=metadata["owner"],
+            summarized_note=summarized_note,
+            **summary
+        )
+        
+        # Build the reuse message now, so a repeated pulse only compares keys and checks the files
+        _last_pulse = (pulse_key, (contract_filename, metadata_filename), _PULSE_REUSED_PREFIX + message)
+        return message
     
     except ValueError as e:
         return f"❌ Configuration error: {str(e)}"
@@ -352,11 +893,117 @@ You can now deploy this contract and mint your chat history as an NFT!"""
         return f"❌ Error generating contract: {str(e)}"
 
 
+# Chat providers get_agent can build a client for (matched case-insensitively)
+ProviderName = Literal["openai", "anthropic", "azure"]
+
+# Tools registered on every agent
+_TOOLS = (pulse_button,)
+
+
+def _cache_per_event_loop(maxsize: int):
+    """
+    Memoize a function per running event loop.
+    
+    Async clients hold connection pools bound to the loop they first ran on, so a cached
+    result is only reused on the same loop. Outside a running loop nothing is cached and
+    every call builds a fresh result.
+    """
+    def decorate(func):
+        cached = functools.lru_cache(maxsize=maxsize)(lambda loop, *args: func(*args))
+        
+        @functools.wraps(func)
+        def wrapper(*args):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return func(*args)
+            return cached(loop, *args)
+        
+        return wrapper
+    return decorate
+
+
+@_cache_per_event_loop(maxsize=4)
+def _get_openai_chat_client(model_id: str, api_key: str | None):
+    """Create an OpenAI chat client, reused on the running loop across agents with the same model and key."""
+    from agent_framework.openai import OpenAIChatClient
+    
+    return OpenAIChatClient(
+        model_id=model_id,
+        api_key=api_key
+    )
+
+
+@_cache_per_event_loop(maxsize=4)
+def _get_anthropic_chat_client(model_id: str, api_key: str):
+    """Create an Anthropic chat client, reused on the running loop across agents with the same model and key."""
+    try:
+        from agent_framework.anthropic import AnthropicChatClient
+    except ImportError as e:
+        raise ImportError("Anthropic support not available. Install with: pip install anthropic") from e
+    
+    return AnthropicChatClient(
+        model_id=model_id,
+        api_key=api_key
+    )
+
+
+@_cache_per_event_loop(maxsize=4)
+def _get_azure_chat_client(model_id: str, api_key: str, endpoint: str, api_version: str):
+    """Create an Azure OpenAI chat client, reused on the running loop across agents with the same deployment settings."""
+    try:
+        from agent_framework.azure import AzureOpenAIChatClient
+    except ImportError as e:
+        raise ImportError("Azure OpenAI support not available. Check agent-framework installation.") from e
+    
+    return AzureOpenAIChatClient(
+        model_id=model_id,
+        api_key=api_key,
+        endpoint=endpoint,
+        api_version=api_version
+    )
+
+
+# Agent instructions template, filled from core JSON
+_INSTRUCTIONS_TEMPLATE = """You are {agent_name}.
+
+DESCRIPTION:
+{agent_description}
+
+CORE IDENTITY:
+You are an AI agent that helps users with tasks through conversation. You maintain a chat history that can be minted as an NFT.
+
+CAPABILITIES:
+- Chat with users and help with their requests
+- Maintain conversation history
+- Generate ERC721 smart contracts when requested (via pulse button)
+
+RESPONSE STYLE:
+- Be helpful, clear, and concise
+- Maintain context from the conversation
+- When users ask about minting or NFTs, explain that they can use the pulse button to generate a contract
+
+IMPORTANT:
+- Owner address is configured in core.json or ERC721_OWNER_ADDRESS environment variable
+- Chat history is stored and can be minted as NFT metadata
+- The pulse button generates a payable ERC721 contract in Yul format
+- Make sure to set the owner address before generating contracts"""
+
+
+@functools.lru_cache(maxsize=8)
+def _build_instructions(agent_name: str, agent_description: str) -> str:
+    """Fill the agent instructions template, reused while core.json keeps the same name and description."""
+    return _INSTRUCTIONS_TEMPLATE.format(
+        agent_name=agent_name,
+        agent_description=agent_description
+    )
+
+
 def get_agent(
     chat_client=None, 
     api_key: str | None = None, 
     model_id: str = "gpt-4o-mini", 
-    provider: str = "openai",
+    provider: ProviderName = "openai",
     core_file_path: str = "core.json",
     **kwargs
 ) -> ChatAgent:
@@ -364,7 +1011,7 @@ def get_agent(
     Creates and returns the agent with chatbot capabilities.
     
     Args:
-        chat_client: Optional pre-configured chat client. If None, creates one.
+        chat_client: Optional pre-configured chat client. If None, creates one, reused within the running event loop.
         api_key: API key for the provider. If None, uses environment variables.
         model_id: Model ID (default: "gpt-4o-mini" for OpenAI).
         provider: Provider name - "openai", "anthropic", "azure" (default: "openai").
@@ -385,28 +1032,18 @@ def get_agent(
             # OpenAI
             if api_key is None:
                 api_key = os.environ.get("OPENAI_API_KEY")
-            chat_client = OpenAIChatClient(
-                model_id=model_id,
-                api_key=api_key
-            )
+            chat_client = _get_openai_chat_client(model_id, api_key)
         
         elif provider == "anthropic":
             # Anthropic Claude
-            if AnthropicChatClient is None:
-                raise ImportError("Anthropic support not available. Install with: pip install anthropic")
             if api_key is None:
                 api_key = os.environ.get("ANTHROPIC_API_KEY")
             if api_key is None:
                 raise ValueError("Anthropic API key required. Set ANTHROPIC_API_KEY environment variable or pass api_key parameter.")
-            chat_client = AnthropicChatClient(
-                model_id=model_id or "claude-3-5-sonnet-20241022",
-                api_key=api_key
-            )
+            chat_client = _get_anthropic_chat_client(model_id or "claude-3-5-sonnet-20241022", api_key)
         
         elif provider == "azure":
             # Azure OpenAI
-            if AzureOpenAIChatClient is None:
-                raise ImportError("Azure OpenAI support not available. Check agent-framework installation.")
             if api_key is None:
                 api_key = os.environ.get("AZURE_OPENAI_API_KEY")
             azure_endpoint = kwargs.get("azure_endpoint") or os.environ.get("AZURE_OPENAI_ENDPOINT")
@@ -415,12 +1052,7 @@ def get_agent(
             if not api_key or not azure_endpoint:
                 raise ValueError("Azure OpenAI requires api_key and azure_endpoint. Set AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT environment variables.")
             
-            chat_client = AzureOpenAIChatClient(
-                model_id=model_id,
-                api_key=api_key,
-                endpoint=azure_endpoint,
-                api_version=api_version
-            )
+            chat_client = _get_azure_chat_client(model_id, api_key, azure_endpoint, api_version)
         
         else:
             raise ValueError(f"Unsupported provider: {provider}. Supported: 'openai', 'anthropic', 'azure'")
@@ -429,38 +1061,14 @@ def get_agent(
     agent_name = core_json.get("name", "Agent Template")
     agent_description = core_json.get("description", "A customizable AI agent")
     
-    agent_instructions = f"""You are {agent_name}.
-
-DESCRIPTION:
-{agent_description}
-
-CORE IDENTITY:
-You are an AI agent that helps users with tasks through conversation. You maintain a chat history that can be minted as an NFT.
-
-CAPABILITIES:
-- Chat with users and help with their requests
-- Maintain conversation history
-- Generate ERC721 smart contracts when requested (via pulse button)
-
-RESPONSE STYLE:
-- Be helpful, clear, and concise
-- Maintain context from the conversation
-- When users ask about minting or NFTs, explain that they can use the pulse button to generate a contract
-
-IMPORTANT:
-- Owner address is configured in core.json or ERC721_OWNER_ADDRESS environment variable
-- Chat history is stored and can be minted as NFT metadata
-- The pulse button generates a payable ERC721 contract in Yul format
-- Make sure to set the owner address before generating contracts"""
+    agent_instructions = _build_instructions(agent_name, agent_description)
     
     # Create agent with tools
     agent = ChatAgent(
         chat_client=chat_client,
         name=agent_name.replace(" ", "_"),
         instructions=agent_instructions,
-        tools=[
-            pulse_button,
-        ],
+        tools=list(_TOOLS),
         temperature=0.7,
         max_tokens=4000,
     )
@@ -468,43 +1076,148 @@ IMPORTANT:
     return agent
 
 
+@_cache_per_event_loop(maxsize=4)
+def _get_shared_agent(api_key, model_id, provider, core_file_path, core_signature, provider_options):
+    """Create an agent; cached per running loop, settings and core file signature."""
+    return get_agent(api_key=api_key, model_id=model_id, provider=provider, core_file_path=core_file_path, **dict(provider_options))
+
+
+def get_shared_agent(
+    api_key: str | None = None,
+    model_id: str = "gpt-4o-mini",
+    provider: ProviderName = "openai",
+    core_file_path: str = "core.json",
+    **kwargs
+) -> ChatAgent:
+    """
+    Returns the agent for these settings, creating it only once per event loop.
+    
+    Takes the same arguments as get_agent (except chat_client). Call it from the loop
+    that will run the agent: its chat client is bound to that loop, so each loop gets its
+    own agent, and calls made outside a running loop get a fresh one. The agent is
+    rebuilt when the core JSON file changes on disk.
+    
+    Returns:
+        Shared ChatAgent instance
+    """
+    core_signature = _core_file_signature(core_file_path)
+    return _get_shared_agent(api_key, model_id, provider, core_file_path, core_signature, tuple(sorted(kwargs.items())))
+
+
+async def batched_stream(chunks, flush_ms: int = 50):
+    """
+    Coalesce a stream of response chunks into larger text batches.
+    
+    Args:
+        chunks: Async iterable of chunks with a .text attribute (e.g. agent.run_stream(...))
+        flush_ms: Yield the collected text once this many milliseconds have passed since the last batch
+        
+    Yields:
+        Text of the chunks received since the previous batch, at the latest when the window
+        expires or a chunk contains a newline; the rest is yielded when the stream ends
+    """
+    clock = asyncio.get_running_loop().time
+    interval = flush_ms / 1000
+    chunks = aiter(chunks)
+    parts = []
+    last_flush = clock()
+    next_chunk = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(anext(chunks))
+            # With text pending, wait only for the rest of the window, so text written before a
+            # stall (e.g. while a tool runs) still shows; the pending chunk is kept, not cancelled
+            timeout = max(last_flush + interval - clock(), 0) if parts else None
+            done, _ = await asyncio.wait((next_chunk,), timeout=timeout)
+            if not done:
+                yield "".join(parts)
+                parts.clear()
+                last_flush = clock()
+                continue
+            
+            chunk_future, next_chunk = next_chunk, None
+            try:
+                chunk = chunk_future.result()
+            except StopAsyncIteration:
+                break
+            text = chunk.text
+            if text:
+                parts.append(text)
+                now = clock()
+                if "\n" in text or now - last_flush > interval:
+                    yield "".join(parts)
+                    parts.clear()
+                    last_flush = now
+    finally:
+        # Stop reading the stream if the consumer gave up early
+        if next_chunk is not None:
+            next_chunk.cancel()
+    if parts:
+        yield "".join(parts)
+
+
+def bind_monotonic_clock(loop: asyncio.AbstractEventLoop):
+    """
+    Make a stdlib event loop call time.monotonic directly for its clock.
+    
+    BaseEventLoop.time() only wraps time.monotonic(), and the loop reads its clock on every
+    scheduling pass; binding the builtin skips that Python frame. Other loops (e.g. uvloop)
+    already use a native clock and are left unchanged.
+    """
+    if isinstance(loop, asyncio.BaseEventLoop):
+        loop.time = time.monotonic
+
+
 async def main():
     """Example usage of the agent."""
-    print("=" * 70)
-    print("Agent Template - Initialization")
-    print("=" * 70)
+    # Each section of demo output is collected and written to stdout in one call
+    out = []
+    out.append("=" * 70 + "\n")
+    out.append("Agent Template - Initialization\n")
+    out.append("=" * 70 + "\n")
+    sys.stdout.write("".join(out))
     
     # Create the agent
     agent = get_agent()
     
-    print("\n✅ Agent created successfully!")
+    out = ["\n✅ Agent created successfully!\n"]
     
     # Get owner address
     owner_address = get_owner_address()
     if owner_address:
-        print(f"🔐 Owner address: {owner_address}")
+        out.append(f"🔐 Owner address: {owner_address}\n")
     else:
-        print("⚠️  Owner address not set. Set it in core.json or ERC721_OWNER_ADDRESS environment variable.")
+        out.append("⚠️  Owner address not set. Set it in core.json or ERC721_OWNER_ADDRESS environment variable.\n")
     
-    print("\n" + "=" * 70)
+    out.append("\n" + "=" * 70 + "\n")
     
     # Example conversation
-    print("\n[Example] Starting conversation...")
+    out.append("\n[Example] Starting conversation...\n")
     query = "Hello! Can you help me with a task?"
     
-    print(f"\n👤 User: {query}\n")
-    print("🤖 Agent: ", end="", flush=True)
+    out.append(f"\n👤 User: {query}\n\n")
+    out.append("🤖 Agent: ")
+    sys.stdout.write("".join(out))
+    sys.stdout.flush()
     
     add_to_chat_history("user", query)
     result = await agent.run(query)
     add_to_chat_history("assistant", result)
-    print(f"{result}\n")
     
-    print("=" * 70)
-    print("\n✨ Agent is ready for requests!")
-    print("💡 Try chatting with the agent, then use the pulse button to mint your chat history!")
+    sys.stdout.write("".join((
+        f"{result}\n\n",
+        "=" * 70 + "\n",
+        "\n✨ Agent is ready for requests!\n",
+        "💡 Try chatting with the agent, then use the pulse button to mint your chat history!\n"
+    )))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Run on uvloop's libuv-based event loop when it is installed (not available on Windows)
+    try:
+        from uvloop import run
+    except ImportError:
+        run = asyncio.run
+    run(main())
 
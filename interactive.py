@@ -7,14 +7,69 @@ Press the pulse button to generate an ERC721 contract with your chat history.
 
 import asyncio
 import os
+import sys
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from agent import get_agent, add_to_chat_history, get_chat_history, pulse_button, clear_chat_history
+from agent import ProviderName, batched_stream, bind_monotonic_clock, get_shared_agent, add_to_chat_history, get_chat_history_columns, get_chat_history_counts, pulse_button, clear_chat_history
 
-async def interactive_session(api_key: str | None = None, model_id: str = "gpt-4o-mini", provider: str = "openai", core_file_path: str = "core.json", **kwargs):
+# Session banners, each written in one call
+_RULE = "=" * 70
+
+_HEADER = f"""{_RULE}
+🤖 Agent Chatbot Interface
+{_RULE}
+
+Provider: {{provider}}
+Initializing agent...
+"""
+
+_READY = f"""
+{_RULE}
+✨ Agent is ready! Start chatting below.
+{_RULE}
+
+💡 Commands:
+   - Type your message to chat with the agent
+   - Type 'pulse' to generate ERC721 contract with chat history
+   - Type 'history' to view chat history
+   - Type 'clear' to clear chat history
+   - Type 'quit' or 'exit' to end session
+{_RULE}
+
+"""
+
+
+async def _ainput(prompt: str) -> str:
+    """Read a line from stdin without blocking the event loop.
+    
+    The read runs on a daemon thread, so a session cancelled while waiting for input can still exit.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def resolve(line, error):
+        if not future.done():
+            if error is None:
+                future.set_result(line)
+            else:
+                future.set_exception(error)
+    
+    def read():
+        try:
+            line, error = input(prompt), None
+        except BaseException as e:
+            line, error = None, e
+        loop.call_soon_threadsafe(resolve, line, error)
+    
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def interactive_session(api_key: str | None = None, model_id: str = "gpt-4o-mini", provider: ProviderName = "openai", core_file_path: str = "core.json", **kwargs):
     """Run an interactive session with the agent.
     
     Args:
@@ -24,30 +79,20 @@ async def interactive_session(api_key: str | None = None, model_id: str = "gpt-4
         core_file_path: Path to the JSON file containing agent core specification.
         **kwargs: Additional provider-specific arguments (e.g., azure_endpoint, api_version for Azure).
     """
-    print("=" * 70)
-    print("🤖 Agent Chatbot Interface")
-    print("=" * 70)
-    print(f"\nProvider: {provider.upper()}")
-    print("Initializing agent...")
+    bind_monotonic_clock(asyncio.get_running_loop())
+    
+    sys.stdout.write(_HEADER.format(provider=provider.upper()))
+    sys.stdout.flush()
     
     # Create agent
-    agent = get_agent(api_key=api_key, model_id=model_id, provider=provider, core_file_path=core_file_path, **kwargs)
+    agent = get_shared_agent(api_key=api_key, model_id=model_id, provider=provider, core_file_path=core_file_path, **kwargs)
     
-    print("\n" + "=" * 70)
-    print("✨ Agent is ready! Start chatting below.")
-    print("=" * 70)
-    print("\n💡 Commands:")
-    print("   - Type your message to chat with the agent")
-    print("   - Type 'pulse' to generate ERC721 contract with chat history")
-    print("   - Type 'history' to view chat history")
-    print("   - Type 'clear' to clear chat history")
-    print("   - Type 'quit' or 'exit' to end session")
-    print("=" * 70 + "\n")
+    sys.stdout.write(_READY)
     
     while True:
         try:
             # Get user input
-            user_input = input("👤 You: ").strip()
+            user_input = (await _ainput("👤 You: ")).strip()
             
             if not user_input:
                 continue
@@ -58,19 +103,19 @@ async def interactive_session(api_key: str | None = None, model_id: str = "gpt-4
             
             if user_input.lower() == 'pulse':
                 print("\n🔘 Pulse button pressed! Generating ERC721 contract...")
-                result = pulse_button()
+                result = await pulse_button()
                 print(f"\n{result}\n")
                 continue
             
             if user_input.lower() == 'history':
-                history = get_chat_history()
-                if history:
-                    print("\n📜 Chat History:")
+                roles, contents, _ = get_chat_history_columns()
+                if roles:
+                    counts = get_chat_history_counts()
+                    print(f"\n📜 Chat History ({counts['user']} user, {counts['assistant']} assistant):")
                     print("-" * 70)
-                    for msg in history:
-                        role = msg['role'].upper()
-                        content = msg['content'][:200] + "..." if len(msg['content']) > 200 else msg['content']
-                        print(f"{role}: {content}")
+                    for role, content in zip(roles, contents):
+                        content = content[:200] + "..." if len(content) > 200 else content
+                        print(f"{role.upper()}: {content}")
                     print("-" * 70)
                 else:
                     print("\n📜 No chat history yet.\n")
@@ -87,17 +132,17 @@ async def interactive_session(api_key: str | None = None, model_id: str = "gpt-4
             # Run agent
             print("\n🤖 Agent: ", end="", flush=True)
             
-            # Use streaming for better UX
-            assistant_response = ""
-            async for chunk in agent.run_stream(user_input):
-                if chunk.text:
-                    print(chunk.text, end="", flush=True)
-                    assistant_response += chunk.text
+            # Use streaming for better UX, writing chunks in 50 ms batches instead of one write per token
+            response_parts = []
+            async for text in batched_stream(agent.run_stream(user_input)):
+                sys.stdout.write(text)
+                sys.stdout.flush()
+                response_parts.append(text)
             
-            print("\n")
+            print("\n", flush=True)
             
             # Add assistant response to history
-            add_to_chat_history("assistant", assistant_response)
+            add_to_chat_history("assistant", "".join(response_parts))
             
         except KeyboardInterrupt:
             print("\n\n✨ Session interrupted. Goodbye!")
@@ -121,8 +166,14 @@ if __name__ == "__main__":
         print("   $env:OPENAI_API_KEY='your-key-here'    (Windows PowerShell)")
         print()
     
+    # Run on uvloop's libuv-based event loop when it is installed (not available on Windows)
+    try:
+        from uvloop import run
+    except ImportError:
+        run = asyncio.run
+    
     try:
-        asyncio.run(interactive_session(api_key=api_key, model_id=model_id, core_file_path=core_file_path))
+        run(interactive_session(api_key=api_key, model_id=model_id, core_file_path=core_file_path))
     except KeyboardInterrupt:
         print("\n\n✨ Session ended. Goodbye!")
 
@@ -5,34 +5,40 @@ Allows users to input their API key and chat with the agent through a web interf
 
 import streamlit as st
 import asyncio
-import json
+import hashlib
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file, once per process rather than on every rerun
+# (no spinner: a spinner element here would precede st.set_page_config, which must come first)
+@st.cache_resource(show_spinner=False)
+def load_env() -> bool:
+    """Load the .env file into the environment; cached so reruns skip re-reading it."""
+    return load_dotenv()
+
+load_env()
 
 from agent import (
-    get_agent,
+    batched_stream,
+    bind_monotonic_clock,
+    get_shared_agent,
     add_to_chat_history,
-    get_chat_history,
+    get_chat_history_columns,
+    get_pulse_call_count,
     clear_chat_history,
     pulse_button,
     get_owner_address,
-    load_core_json
-)
-
-# Page configuration
-st.set_page_config(
-    page_title="Agent Chatbot",
-    page_icon="🤖",
-    layout="wide",
-    initial_sidebar_state="expanded"
+    load_core_json,
+    save_core_json
 )
 
-# Custom CSS for better styling
-st.markdown("""
+# Page styles
+_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -61,7 +67,18 @@ st.markdown("""
         border-radius: 0.5rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Page configuration
+st.set_page_config(
+    page_title="Agent Chatbot",
+    page_icon="🤖",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Custom CSS for better styling (sent on every rerun: Streamlit rebuilds the page each time)
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # Initialize session state
 if "messages" not in st.session_state:
@@ -76,24 +93,100 @@ if "provider" not in st.session_state:
     st.session_state.provider = "openai"
 if "model_id" not in st.session_state:
     st.session_state.model_id = "gpt-4o-mini"
+if "response_cache" not in st.session_state:
+    st.session_state.response_cache = OrderedDict()
+
+# Limits of the per-session cache of agent responses to identical prompts
+_RESPONSE_CACHE_MAX = 1000
+_RESPONSE_CACHE_TTL = 3600  # seconds
+
+# Marks the end of a stream passed from the event loop thread to the script thread
+_STREAM_END = object()
+
+@st.cache_resource
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Start one long-lived event loop on a daemon thread, shared by every session and rerun."""
+    loop = asyncio.new_event_loop()
+    bind_monotonic_clock(loop)
+    threading.Thread(target=loop.run_forever, name="agent-event-loop", daemon=True).start()
+    return loop
+
+def run_async(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop()).result()
+
+def stream_async(chunks):
+    """Iterate an agent chunk stream from the script thread, as text batches, while it runs on the shared loop."""
+    batches = queue.Queue()
+    
+    async def pump():
+        try:
+            async for text in batched_stream(chunks):
+                batches.put(text)
+        finally:
+            batches.put(_STREAM_END)
+    
+    future = asyncio.run_coroutine_threadsafe(pump(), get_background_loop())
+    try:
+        while (text := batches.get()) is not _STREAM_END:
+            yield text
+        # Re-raise any error from the stream
+        future.result()
+    finally:
+        # Stop the stream on the loop if the script stopped reading early (e.g. a rerun or stop)
+        future.cancel()
+
+def stream_agent_cached(prompt: str):
+    """
+    Stream the agent's reply to a prompt, replaying this session's reply to the same recent prompt and model.
+    
+    Replies during which pulse_button ran are not cached, since the tool has side effects.
+    """
+    cache = st.session_state.response_cache
+    key = hashlib.sha256(
+        "\0".join((st.session_state.provider, st.session_state.model_id, prompt)).encode("utf-8")
+    ).hexdigest()
+    
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        cache.move_to_end(key)
+        yield entry[1]
+        return
+    
+    parts = []
+    pulse_calls = get_pulse_call_count()
+    for text in stream_async(st.session_state.agent.run_stream(prompt)):
+        parts.append(text)
+        yield text
+    
+    # A reply that ran the pulse tool describes files made for this history; never replay it
+    if get_pulse_call_count() != pulse_calls:
+        return
+    
+    cache[key] = (time.monotonic() + _RESPONSE_CACHE_TTL, "".join(parts))
+    cache.move_to_end(key)
+    while len(cache) > _RESPONSE_CACHE_MAX:
+        cache.popitem(last=False)
 
 def load_chat_history_to_session():
     """Load chat history from agent module to session state."""
     if not st.session_state.chat_history_loaded:
-        history = get_chat_history()
-        st.session_state.messages = []
-        for msg in history:
-            role = "user" if msg["role"] == "user" else "assistant"
-            st.session_state.messages.append({
-                "role": role,
-                "content": msg["content"]
-            })
+        # Build the messages from the role and content columns, without per-message history dicts
+        roles, contents, _ = get_chat_history_columns()
+        st.session_state.messages = [
+            {"role": "user" if role == "user" else "assistant", "content": content}
+            for role, content in zip(roles, contents)
+        ]
         st.session_state.chat_history_loaded = True
 
 def initialize_agent(api_key: str, model_id: str = "gpt-4o-mini", provider: str = "openai", **kwargs):
     """Initialize the agent with the provided API key and provider."""
     try:
-        agent = get_agent(api_key=api_key, model_id=model_id, provider=provider, **kwargs)
+        # Build on the background loop, so the agent's cached chat client belongs to the loop that runs it
+        async def build():
+            return get_shared_agent(api_key=api_key, model_id=model_id, provider=provider, **kwargs)
+        
+        agent = run_async(build())
         st.session_state.agent = agent
         st.session_state.api_key_set = True
         st.session_state.provider = provider
@@ -103,14 +196,31 @@ def initialize_agent(api_key: str, model_id: str = "gpt-4o-mini", provider: str
         st.error(f"Error initializing agent: {str(e)}")
         return False
 
+# Per-provider lookup tables, shared read-only by the sidebar (Streamlit re-runs this script, so they are rebuilt on each rerun)
+_PROVIDER_MODELS = MappingProxyType({
+    "openai": ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"],
+    "anthropic": ["claude-3-5-sonnet-20241022", "claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"],
+    "azure": ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"]  # Azure uses OpenAI models
+})
+
+# Models offered for an unknown provider
+_DEFAULT_MODELS = _PROVIDER_MODELS["openai"]
+
+_API_KEY_PLACEHOLDERS = MappingProxyType({
+    "openai": "sk-...",
+    "anthropic": "sk-ant-...",
+    "azure": "Azure API key"
+})
+
+_API_KEY_ENV_VARS = MappingProxyType({
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "azure": "AZURE_OPENAI_API_KEY"
+})
+
 def get_models_for_provider(provider: str) -> list:
     """Get available models for a provider."""
-    models = {
-        "openai": ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"],
-        "anthropic": ["claude-3-5-sonnet-20241022", "claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"],
-        "azure": ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"]  # Azure uses OpenAI models
-    }
-    return models.get(provider.lower(), models["openai"])
+    return _PROVIDER_MODELS.get(provider.lower(), _DEFAULT_MODELS)
 
 # Sidebar for API key and settings
 with st.sidebar:
@@ -148,17 +258,8 @@ with st.sidebar:
     
     # API Key Input
     st.subheader("🔑 API Key")
-    api_key_placeholder = {
-        "openai": "sk-...",
-        "anthropic": "sk-ant-...",
-        "azure": "Azure API key"
-    }.get(provider, "API key...")
-    
-    api_key_env_var = {
-        "openai": "OPENAI_API_KEY",
-        "anthropic": "ANTHROPIC_API_KEY",
-        "azure": "AZURE_OPENAI_API_KEY"
-    }.get(provider, "OPENAI_API_KEY")
+    api_key_placeholder = _API_KEY_PLACEHOLDERS.get(provider, "API key...")
+    api_key_env_var = _API_KEY_ENV_VARS.get(provider, "OPENAI_API_KEY")
     
     api_key = st.text_input(
         f"Enter your {provider.upper()} API Key",
@@ -168,15 +269,14 @@ with st.sidebar:
         help=f"Enter your {provider.upper()} API key. Can also set {api_key_env_var} environment variable."
     )
     
-    # Model selection based on provider
-    available_models = get_models_for_provider(provider)
-    default_model = available_models[0]
+    # Model selection based on provider, looked up again only when the provider changes
+    if st.session_state.get("models_for") != provider:
+        st.session_state.models_for = provider
+        st.session_state.models = get_models_for_provider(provider)
+    available_models = st.session_state.models
     
     # Try to get saved model or use default
-    current_model = st.session_state.get("model_id", default_model)
-    if current_model not in available_models:
-        current_model = default_model
-    
+    current_model = st.session_state.get("model_id")
     model_index = available_models.index(current_model) if current_model in available_models else 0
     
     model_id = st.selectbox(
@@ -220,19 +320,24 @@ with st.sidebar:
         value=current_owner if current_owner else "",
         placeholder="0x...",
         help="Set the owner address for generated ERC721 contracts. Can be set in core.json or here."
-    )
+    ).strip()
     
-    if owner_address and owner_address != current_owner:
-        # Save to core.json
-        try:
-            core_json = load_core_json()
-            core_json["owner"] = owner_address
-            with open("core.json", 'w', encoding='utf-8') as f:
-                json.dump(core_json, f, indent=2)
-            st.success("✅ Owner address saved to core.json")
-            st.rerun()
-        except Exception as e:
-            st.error(f"Error saving owner address: {e}")
+    # Save only on request, and only a real change; case counts, so an EIP-55 checksum fix can be saved
+    if st.button("💾 Save Owner Address", use_container_width=True):
+        if not owner_address:
+            st.warning("⚠️ Enter an owner address to save")
+        elif owner_address == (current_owner or "").strip():
+            st.info("Owner address is unchanged")
+        else:
+            # Save to core.json
+            try:
+                core_json = load_core_json()
+                core_json["owner"] = owner_address
+                save_core_json(core_json)
+                st.success("✅ Owner address saved to core.json")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error saving owner address: {e}")
     
     if current_owner:
         st.code(current_owner, language=None)
@@ -247,6 +352,7 @@ with st.sidebar:
     if st.button("🗑️ Clear Chat History", use_container_width=True):
         clear_chat_history()
         st.session_state.messages = []
+        st.session_state.response_cache.clear()
         st.session_state.chat_history_loaded = False
         st.success("Chat history cleared!")
         st.rerun()
@@ -260,7 +366,7 @@ with st.sidebar:
                 st.error("⚠️ Please set the owner address above before generating contracts.")
             else:
                 with st.spinner("Generating ERC721 contract..."):
-                    result = pulse_button(owner_address=owner_addr)
+                    result = run_async(pulse_button(owner_address=owner_addr))
                     st.success("✅ Contract generated!")
                     st.info(result)
         else:
@@ -296,24 +402,8 @@ if st.session_state.api_key_set:
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    # Run agent asynchronously
-                    # Handle event loop for Streamlit compatibility
-                    try:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            # Use nest_asyncio if loop is already running
-                            import nest_asyncio
-                            nest_asyncio.apply()
-                            response = asyncio.run(st.session_state.agent.run(prompt))
-                        else:
-                            response = loop.run_until_complete(
-                                st.session_state.agent.run(prompt)
-                            )
-                    except RuntimeError:
-                        # No event loop exists, create one
-                        response = asyncio.run(st.session_state.agent.run(prompt))
-                    
-                    st.markdown(response)
+                    # Stream the reply from the shared background loop; write_stream renders it and returns the full text
+                    response = st.write_stream(stream_agent_cached(prompt))
                     
                     # Add assistant response to chat
                     st.session_state.messages.append({"role": "assistant", "content": response})